@@ -4,33 +4,198 @@ Web interface for UT Registration Checker
 """
 
 from flask import Flask, render_template, request, jsonify
-import json
+from flask.json.provider import JSONProvider
+import orjson
 import os
+import re
+import sys
+import asyncio
+import atexit
+import threading
 from datetime import datetime
 
+from registration_checker import StatusStore, monitor_courses
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype="application/json")
+
+
 app = Flask(__name__)
+app.json_provider_class = OrjsonProvider
+app.json = OrjsonProvider(app)
 
 # File to store course configuration
 CONFIG_FILE = 'courses.json'
 
+# Indentation keeps the file readable by hand, and orjson applies it natively at no real cost
+CONFIG_DUMP_OPTIONS = orjson.OPT_INDENT_2
+
+# Semester codes are five digits (e.g. 20262), course codes are all digits
+_is_semester_code = re.compile(r'\d{5}').fullmatch
+_is_course_code = re.compile(r'\d+').fullmatch
+
+# Parsed configuration, keyed on the file's mtime so unchanged reads skip the parse
+_CACHE = {"mtime": 0, "data": None}
+
+# Saves are debounced: the latest config is held here and written once edits settle
+FLUSH_DELAY_SECONDS = 0.5
+_PENDING = {"config": None, "timer": None}
+_write_lock = threading.Lock()
+
 def load_courses():
     """Load course configuration from file."""
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    return {"semester": "", "courses": []}
+    pending = _PENDING["config"]
+    if pending is not None:
+        return pending
+    try:
+        mtime = os.stat(CONFIG_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return {"semester": "", "courses": []}
+    if mtime != _CACHE["mtime"]:
+        with open(CONFIG_FILE, 'rb') as f:
+            _CACHE["data"] = orjson.loads(f.read())
+        _CACHE["mtime"] = mtime
+    return _CACHE["data"]
+
+def flush_courses():
+    """Write any pending configuration to disk atomically."""
+    with _write_lock:
+        config = _PENDING["config"]
+        if _PENDING["timer"] is not None:
+            _PENDING["timer"].cancel()
+            _PENDING["timer"] = None
+        if config is None:
+            return
+        tmp_file = CONFIG_FILE + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(config, option=CONFIG_DUMP_OPTIONS))
+        os.replace(tmp_file, CONFIG_FILE)
+        _CACHE["mtime"] = os.stat(CONFIG_FILE).st_mtime_ns
+        _CACHE["data"] = config
+        _PENDING["config"] = None
 
 def save_courses(semester, courses):
-    """Save course configuration to file."""
+    """Save course configuration, writing it to file once edits settle."""
     config = {
         "semester": semester,
         "courses": courses,
-        "last_updated": datetime.now().isoformat()
+        "last_updated": datetime.now()
     }
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
+    with _write_lock:
+        _PENDING["config"] = config
+        if _PENDING["timer"] is not None:
+            _PENDING["timer"].cancel()
+        timer = threading.Timer(FLUSH_DELAY_SECONDS, flush_courses)
+        timer.daemon = True
+        timer.start()
+        _PENDING["timer"] = timer
     return config
 
+atexit.register(flush_courses)
+
+# Latest results from the background monitor, read by /api/status
+status_store = StatusStore()
+_monitor = {"thread": None, "loop": None, "task": None}
+_monitor_lock = threading.Lock()
+
+# How long to wait for a stopped monitor to close its browser
+MONITOR_STOP_TIMEOUT_SECONDS = 30
+
+MONITOR_NO_CONFIG_ERROR = "Save a semester and at least one course first"
+MONITOR_STILL_STOPPING_ERROR = "The previous monitor is still closing its browser, try again shortly"
+
+def _run_monitor(loop, task):
+    """Run the monitor task on its own event loop (monitor thread target)."""
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(task)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        loop.close()
+
+def _monitor_running():
+    """Whether the monitor thread is alive."""
+    thread = _monitor["thread"]
+    return thread is not None and thread.is_alive()
+
+def _start_monitor_locked():
+    """Start a monitor for the saved configuration. Caller holds _monitor_lock.
+
+    Returns an error message, or None if the monitor started.
+    """
+    config = load_courses()
+    semester = config.get('semester')
+    courses = config.get('courses')
+    if not semester or not courses:
+        return MONITOR_NO_CONFIG_ERROR
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(monitor_courses(semester, courses, status_store))
+    thread = threading.Thread(target=_run_monitor, args=(loop, task), name="course-monitor", daemon=True)
+    thread.start()
+    _monitor.update(thread=thread, loop=loop, task=task)
+    return None
+
+def _stop_monitor_locked():
+    """Stop the running monitor, if any. Caller holds _monitor_lock.
+
+    Returns False if it was still running when the stop timeout ran out.
+    """
+    if not _monitor_running():
+        return True
+    # Cancelling also interrupts a pending login wait; the monitor closes its browser on the way out
+    _monitor["loop"].call_soon_threadsafe(_monitor["task"].cancel)
+    _monitor["thread"].join(timeout=MONITOR_STOP_TIMEOUT_SECONDS)
+    return not _monitor_running()
+
+def start_monitor():
+    """Start monitoring the saved courses in a background thread, unless already running.
+
+    Returns an error message, or None if the monitor is running.
+    """
+    with _monitor_lock:
+        if _monitor_running():
+            return None
+        return _start_monitor_locked()
+
+def stop_monitor():
+    """Stop the background monitor, if running.
+
+    Returns an error message, or None if the monitor has stopped.
+    """
+    with _monitor_lock:
+        if not _stop_monitor_locked():
+            return MONITOR_STILL_STOPPING_ERROR
+        return None
+
+def restart_monitor():
+    """Restart the background monitor so it picks up the saved course list.
+
+    Returns an error message, or None if the new monitor started. A new monitor is
+    never started while the old one is still running, so only one browser is open.
+    """
+    with _monitor_lock:
+        if not _stop_monitor_locked():
+            return MONITOR_STILL_STOPPING_ERROR
+        return _start_monitor_locked()
+
+@app.before_request
+def start_monitor_on_first_request():
+    """Start the monitor once the app is serving requests."""
+    if _monitor["thread"] is None:
+        start_monitor()
+
 @app.route('/')
 def index():
     """Main page."""
@@ -49,29 +214,70 @@ def get_courses():
 def update_courses():
     """Update course configuration."""
     data = request.json
-    semester = data.get('semester', '').strip()
-    courses = [c.strip() for c in data.get('courses', []) if c.strip()]
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    
+    semester = data.get('semester', '')
+    if not isinstance(semester, str):
+        return jsonify({"error": "Semester code must be 5 digits (e.g. 20262)"}), 400
+    semester = semester.strip()
+    
+    courses = data.get('courses', [])
+    if not isinstance(courses, list):
+        return jsonify({"error": "Courses must be a list of course codes"}), 400
+    
+    invalid = [str(c) for c in courses if not isinstance(c, str)]
+    if invalid:
+        return jsonify({"error": f"Invalid course code(s): {', '.join(invalid)} (should be text, e.g. \"56615\")"}), 400
+    
+    # Drop blanks and duplicates, keeping the order courses were added in
+    courses = list(dict.fromkeys(c for c in map(str.strip, courses) if c))
     
     if not semester:
         return jsonify({"error": "Semester code is required"}), 400
     
+    if not _is_semester_code(semester):
+        return jsonify({"error": "Semester code must be 5 digits (e.g. 20262)"}), 400
+    
     if not courses:
         return jsonify({"error": "At least one course code is required"}), 400
     
+    invalid = [c for c in courses if not _is_course_code(c)]
+    if invalid:
+        return jsonify({"error": f"Invalid course code(s): {', '.join(invalid)} (should be numbers only)"}), 400
+    
     config = save_courses(semester, courses)
+    error = restart_monitor()
+    if error:
+        return jsonify({"error": f"Configuration saved, but monitoring was not restarted: {error}"}), 503
     return jsonify({"success": True, "config": config})
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Get monitoring status."""
-    # This would integrate with the actual monitoring script
-    # For now, return a placeholder
-    return jsonify({
-        "monitoring": False,
-        "last_check": None,
-        "courses": []
-    })
+    return jsonify(status_store.snapshot())
+
+@app.route('/api/monitor/start', methods=['POST'])
+def start_monitoring():
+    """Start monitoring the saved courses."""
+    error = start_monitor()
+    if error:
+        return jsonify({"error": error}), 400
+    return jsonify(status_store.snapshot())
+
+@app.route('/api/monitor/stop', methods=['POST'])
+def stop_monitoring():
+    """Stop monitoring."""
+    error = stop_monitor()
+    if error:
+        return jsonify({"error": error}), 503
+    return jsonify(status_store.snapshot())
+
+# One worker process: the course monitor and pending config writes live in memory
+SERVE_COMMAND = "gunicorn -w 1 -k gthread --threads 4 -b 0.0.0.0:3000 wsgi:app"
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=3000)
+    print("Run the web interface with a production server:")
+    print(f"  {SERVE_COMMAND}")
+    sys.exit(1)
 
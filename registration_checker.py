@@ -4,11 +4,21 @@ UT Registration Checker
 Monitors course registration status and alerts when courses open up.
 """
 
-import time
+import asyncio
+import json
 import os
+import signal
+import subprocess
 import sys
+import threading
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import httpx
+import xxhash
+import lxml.etree
+import lxml.html
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 
 # Base URL for course schedule
 BASE_COURSE_URL = "https://utdirect.utexas.edu/apps/registrar/course_schedule"
@@ -16,6 +26,18 @@ BASE_COURSE_URL = "https://utdirect.utexas.edu/apps/registrar/course_schedule"
 # Registration page URL to open when a course opens
 REGISTRATION_URL = "https://utdirect.utexas.edu/registration/registration.WBX"
 
+# Alarm bells and sounds, run together in one background shell (the spoken message is $1)
+_ALARM_SCRIPT = (
+    'for i in 1 2 3 4 5; do printf "\\a"; sleep 0.3; done & '
+    'for i in 1 2 3 4 5; do afplay /System/Library/Sounds/Sosumi.aiff; done & '
+    'say "$1" & '
+    'afplay /System/Library/Sounds/Glass.aiff & '
+    'afplay /System/Library/Sounds/Basso.aiff &'
+)
+
+# Saved browser login (cookies and storage), reused on the next start
+AUTH_STATE_FILE = ".auth.json"
+
 # Check interval in minutes
 CHECK_INTERVAL_MINUTES = 5
 CHECK_INTERVAL_SECONDS = CHECK_INTERVAL_MINUTES * 60
@@ -23,14 +45,86 @@ CHECK_INTERVAL_SECONDS = CHECK_INTERVAL_MINUTES * 60
 # Selector for the status cell in the table
 STATUS_SELECTOR = 'td[data-th="Status"]'
 
-# Expected title when logged in (to detect successful login)
-LOGGED_IN_TITLE = "UT Austin Registrar"
+# Statuses that mean a seat can be registered for, matched on the part before any ";"
+# (UT lists some sections as e.g. "open; reserved")
+_OPEN_STATES = frozenset({"open"})
+
+# Compiled XPath for the status cell, used on pages fetched over HTTP
+_STATUS_XPATH = lxml.etree.XPath('string(//td[@data-th="Status"])')
+
+# Resources the server-rendered status cell doesn't need, skipped on course pages after login
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media", "stylesheet", "script"})
+
+# Cache validators, body hash and last parsed status per course URL, so unchanged
+# pages are neither downloaded (conditional GET) nor parsed (same hash) again
+_PAGE_CACHE = {}
+
+
+@dataclass
+class StatusStore:
+    """Latest course statuses, shared between the monitor and the web interface."""
+    statuses: dict = field(default_factory=dict)
+    last_check: datetime = None
+    monitoring: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def start(self, names):
+        """Mark monitoring as started for the named courses, none checked yet."""
+        with self.lock:
+            self.statuses = dict.fromkeys(names)
+            self.last_check = None
+            self.monitoring = True
+
+    def stop(self):
+        """Mark monitoring as stopped, keeping the last statuses."""
+        with self.lock:
+            self.monitoring = False
+
+    def update(self, statuses):
+        """Record the statuses from a completed check."""
+        with self.lock:
+            self.statuses = dict(statuses)
+            self.last_check = datetime.now()
+
+    def snapshot(self):
+        """Return the current state as a JSON-serializable dict."""
+        with self.lock:
+            return {
+                "monitoring": self.monitoring,
+                "last_check": self.last_check,
+                "courses": [{"name": name, "status": status} for name, status in self.statuses.items()],
+            }
+
+
+@dataclass
+class SharedPage:
+    """Browser page shared by all courses for login and fallback checks.
+
+    Create it inside the running monitor so its lock belongs to that event loop.
+    """
+    page: object
+    status_locator: object
+    # Serializes fallback checks, which navigate the shared page
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Set during a check once a fallback has refreshed the session, or given up on login,
+    # so the other courses retry over HTTP or skip the browser instead of repeating it
+    session_renewed: bool = False
+    login_failed: bool = False
+
+
+# Formatted timestamp for the current second, reused by log() within that second
+_log_second = 0
+_log_timestamp = ""
 
 
 def log(message):
     """Print timestamped log message."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] {message}")
+    global _log_second, _log_timestamp
+    second = int(time.time())
+    if second != _log_second:
+        _log_second = second
+        _log_timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+    sys.stdout.write(f"[{_log_timestamp}] {message}\n")
 
 
 def get_course_codes():
@@ -73,53 +167,45 @@ def get_course_codes():
     return semester, course_codes
 
 
-def build_course_urls(semester, course_codes):
-    """Build course URLs from semester and course codes."""
-    urls = []
-    for code in course_codes:
-        url = f"{BASE_COURSE_URL}/{semester}/{code}/"
-        urls.append(url)
-    return urls
+def build_course_jobs(semester, course_codes):
+    """Build (url, name) pairs for each course from semester and course codes."""
+    return [(f"{BASE_COURSE_URL}/{semester}/{code}/", f"Course {code}") for code in course_codes]
 
 
-def play_alarm(course_name, status, page):
+async def play_alarm(course_name, status, page):
     """Play a loud alarm when a course opens up and open registration page."""
     log("🔔 PLAYING ALARM...")
     
-    # Play system alert sound multiple times
-    for _ in range(5):
-        # Terminal bell
-        print("\a", end="", flush=True)
-        # macOS system sound (Sosumi is a loud alert sound)
-        os.system('afplay /System/Library/Sounds/Sosumi.aiff 2>/dev/null &')
-        time.sleep(0.3)
-    
-    # Speak alert message
+    # Terminal bells, macOS system sounds (Sosumi is a loud alert sound) and spoken alert message
+    # stdout stays attached to the terminal so the bells are heard
+    sys.stdout.flush()
     message = f"Alert! {course_name} is now {status}. Check registration immediately!"
-    os.system(f'say "{message}" &')
-    
-    # Also try playing a few more system sounds
-    os.system('afplay /System/Library/Sounds/Glass.aiff 2>/dev/null &')
-    time.sleep(0.5)
-    os.system('afplay /System/Library/Sounds/Basso.aiff 2>/dev/null &')
+    subprocess.Popen(
+        ['/bin/sh', '-c', _ALARM_SCRIPT, 'alarm', message],
+        stderr=subprocess.DEVNULL,
+    )
     
     # Open registration page in a new tab
     try:
         log(f"Opening registration page in a new tab: {REGISTRATION_URL}")
-        with page.expect_popup() as popup_info:
-            page.evaluate(f'window.open("{REGISTRATION_URL}", "_blank")')
-        registration_page = popup_info.value
+        async with page.expect_popup() as popup_info:
+            await page.evaluate(f'window.open("{REGISTRATION_URL}", "_blank")')
+        registration_page = await popup_info.value
         log("✓ Registration page opened in new tab")
     except Exception as e:
         log(f"WARNING: Could not open registration page: {e}")
 
 
-def get_status(page):
-    """Extract the status text from the course page."""
+def is_open(status):
+    """Whether a course status means seats can be registered for."""
+    return status is not None and status.split(";", 1)[0].strip() in _OPEN_STATES
+
+
+async def get_status(status_element):
+    """Extract the status text from the course page's status cell locator."""
     try:
-        status_element = page.locator(STATUS_SELECTOR).first
-        status_text = status_element.inner_text(timeout=5000).strip().lower()
-        return status_text
+        status_text = (await status_element.inner_text(timeout=5000)).strip().lower()
+        return sys.intern(status_text)
     except PlaywrightTimeoutError:
         log("ERROR: Could not find status element on page")
         return None
@@ -128,84 +214,195 @@ def get_status(page):
         return None
 
 
-def wait_for_login(page, url):
+def parse_status(content):
+    """Extract the status text from the course page HTML."""
+    tree = lxml.html.fromstring(content)
+    status_text = _STATUS_XPATH(tree).strip().lower()
+    return sys.intern(status_text) if status_text else None
+
+
+async def load_session_cookies(context, client):
+    """Copy the browser's login cookies into the HTTP client."""
+    for cookie in await context.cookies():
+        client.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+
+
+async def block_subresources(route):
+    """Abort course page requests that aren't needed to read the course status.
+
+    Other pages, like the SSO login a fallback check may be sent through, load in full.
+    """
+    request = route.request
+    if request.resource_type in _BLOCKED_RESOURCE_TYPES and request.frame.url.startswith(BASE_COURSE_URL):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+def is_login_page(page_title):
+    """Whether a page title means we were sent to login instead of the course page."""
+    return "Sign in" in page_title or "Stale Request" in page_title
+
+
+async def save_login_state(context):
+    """Save the browser's login to AUTH_STATE_FILE, readable only by this user."""
+    state = await context.storage_state()
+    fd = os.open(AUTH_STATE_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    # The mode above only applies to new files, so also tighten an existing one
+    os.fchmod(fd, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(state, f)
+
+
+async def wait_for_login(page, url):
     """Wait for user to complete login by detecting when page loads course details."""
     log(f"Navigating to {url}")
-    page.goto(url, wait_until="networkidle")
+    await page.goto(url, wait_until="networkidle")
     
     # Check if we're on the login page or the course page
-    page_title = page.title()
+    page_title = await page.title()
     
-    if "Sign in" in page_title or "Stale Request" in page_title:
+    if is_login_page(page_title):
+        if os.path.exists(AUTH_STATE_FILE):
+            log("Saved login has expired.")
+            os.remove(AUTH_STATE_FILE)
         log("Waiting for you to login... (browser is open, please login manually)")
         log("The script will automatically detect when login is complete.")
         
-        # Wait for the page title to change to the course page
-        # Or wait for the status element to appear
+        # Block until the status element appears (means we're on course page)
         max_wait_time = 300  # 5 minutes max wait
-        start_time = time.time()
-        
-        while time.time() - start_time < max_wait_time:
-            try:
-                # Check if status element exists (means we're on course page)
-                status_element = page.locator(STATUS_SELECTOR).first
-                if status_element.is_visible(timeout=2000):
-                    log("✓ Login detected! Course page loaded.")
-                    return True
-            except:
-                pass
-            
-            # Also check title
-            current_title = page.title()
-            if LOGGED_IN_TITLE in current_title and "Sign in" not in current_title:
-                log("✓ Login detected! Course page loaded.")
-                return True
-            
-            time.sleep(2)  # Check every 2 seconds
+        try:
+            await page.wait_for_selector(STATUS_SELECTOR, state="visible", timeout=max_wait_time * 1000)
+        except PlaywrightTimeoutError:
+            log("ERROR: Timeout waiting for login. Please try again.")
+            return False
         
-        log("ERROR: Timeout waiting for login. Please try again.")
-        return False
+        log("✓ Login detected! Course page loaded.")
     else:
         # Already on course page (maybe already logged in)
         log("Already on course page (may already be logged in)")
-        return True
+    
+    # Save the login so the next start can skip it
+    await save_login_state(page.context)
+    return True
+
+
+async def fetch_status(client, url):
+    """Fetch a course page over HTTP and read its status.
+
+    Returns (expired, status), where expired means the request was sent to login.
+    """
+    headers = {}
+    cached = _PAGE_CACHE.get(url)
+    if cached:
+        etag, last_modified, _, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    response = await client.get(url, headers=headers, timeout=30)
+    
+    if response.status_code == 304 and cached:
+        # Page unchanged since last check, reuse its status
+        return False, cached[3]
+    if response.is_redirect:
+        return True, None
+    
+    response.raise_for_status()
+    body_hash = xxhash.xxh3_64_intdigest(response.content)
+    if cached and cached[2] == body_hash:
+        # Same bytes as last check, skip parsing
+        status = cached[3]
+    else:
+        status = parse_status(response.content)
+    if status:
+        _PAGE_CACHE[url] = (
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            body_hash,
+            status,
+        )
+    return False, status
+
 
+async def check_in_browser(client, shared, url):
+    """Check a course in the browser after its HTTP request was sent to login.
 
-def check_course_status(page, url, course_name):
+    Returns (renewed, status), where renewed means the HTTP client has fresh cookies
+    and the course should be fetched over HTTP again.
+    """
+    async with shared.lock:
+        if shared.login_failed:
+            # Login already timed out this check, don't wait again for every course
+            return False, None
+        if shared.session_renewed:
+            # An earlier course already refreshed the session
+            return True, None
+        
+        await shared.page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        if is_login_page(await shared.page.title()):
+            # The browser's login expired too, so drop the saved login and ask again
+            if not await wait_for_login(shared.page, url):
+                shared.login_failed = True
+                return False, None
+            await load_session_cookies(shared.page.context, client)
+            shared.session_renewed = True
+            return True, None
+        
+        status = await get_status(shared.status_locator)
+        await load_session_cookies(shared.page.context, client)
+        shared.session_renewed = True
+        return False, status
+
+
+async def check_course_status(client, shared, url, course_name):
     """Check the status of a single course."""
     try:
         log(f"Checking {course_name}...")
-        page.reload(wait_until="networkidle", timeout=30000)
+        expired, status = await fetch_status(client, url)
+        
+        if expired:
+            # Session expired and we were sent to SSO, let the browser re-authenticate
+            log(f"  Session expired for {course_name}, checking in browser instead")
+            renewed, status = await check_in_browser(client, shared, url)
+            if renewed:
+                expired, status = await fetch_status(client, url)
         
-        status = get_status(page)
         if status:
-            log(f"  Status: {status}")
+            log(f"  {course_name} status: {status}")
             return status
         else:
-            log(f"  ERROR: Could not determine status")
+            log(f"  ERROR: Could not determine status of {course_name}")
             return None
     except Exception as e:
-        log(f"  ERROR: Failed to check course: {e}")
+        log(f"  ERROR: Failed to check {course_name}: {e}")
         return None
 
 
-def monitor_courses():
-    """Main monitoring function."""
-    # Get course codes from user
-    semester, course_codes = get_course_codes()
-    if not semester or not course_codes:
-        return
+async def check_all_courses(client, shared, jobs):
+    """Check all courses concurrently, returning statuses in course order."""
+    shared.login_failed = False
+    shared.session_renewed = False
+    return await asyncio.gather(*[
+        check_course_status(client, shared, url, name)
+        for url, name in jobs
+    ])
+
+
+async def monitor_courses(semester, course_codes, store=None):
+    """Main monitoring function, publishing each check's results to store if given."""
+    if store is None:
+        store = StatusStore()
     
     # Build URLs from course codes
-    course_urls = build_course_urls(semester, course_codes)
-    course_names = [f"Course {code}" for code in course_codes]
+    jobs = build_course_jobs(semester, course_codes)
     
     log("=" * 60)
     log("UT Registration Checker Starting")
     log(f"Monitoring {len(course_codes)} course(s): {', '.join(course_codes)}")
     log("=" * 60)
     
-    with sync_playwright() as p:
+    async with async_playwright() as p:
         # Launch browser in headed mode so user can login
         # Try Firefox first (more stable on macOS), fallback to Chromium
         log("Launching browser...")
@@ -213,14 +410,14 @@ def monitor_courses():
         try:
             # Try Firefox first - more stable on macOS
             log("Attempting to launch Firefox...")
-            browser = p.firefox.launch(headless=False)
+            browser = await p.firefox.launch(headless=False)
             log("✓ Firefox launched successfully")
         except Exception as e:
             log(f"Firefox launch failed: {e}")
             log("Trying Chromium with additional stability options...")
             try:
                 # Try Chromium with additional launch args for stability
-                browser = p.chromium.launch(
+                browser = await p.chromium.launch(
                     headless=False,
                     args=[
                         '--disable-blink-features=AutomationControlled',
@@ -238,110 +435,128 @@ def monitor_courses():
                 log("Run: python3.11 -m playwright install firefox")
                 return
         
-        context = browser.new_context()
+        context = await browser.new_context(
+            storage_state=AUTH_STATE_FILE if os.path.exists(AUTH_STATE_FILE) else None
+        )
         
-        # Store pages for all courses
-        pages = []
+        # Status checks are plain HTTP requests that reuse the browser's login cookies
+        client = httpx.AsyncClient(http2=True)
         
+        store.start(name for _, name in jobs)
         try:
             # Step 1: Navigate to first course and wait for login
-            log(f"\nOpening first course: {course_names[0]} ({course_codes[0]})")
-            page1 = context.new_page()
-            pages.append(page1)
+            # One page is shared by all courses for login and browser fallback checks
+            first_url, first_name = jobs[0]
+            log(f"\nOpening first course: {first_name} ({course_codes[0]})")
+            page = await context.new_page()
             
-            if not wait_for_login(page1, course_urls[0]):
+            if not await wait_for_login(page, first_url):
                 log("Failed to complete login. Exiting.")
                 return
             
-            # Step 2: Open remaining courses in new tabs (should already be logged in)
-            if len(course_codes) > 1:
-                log("\n" + "=" * 60)
-                log("Opening additional course pages in new tabs...")
-                for i in range(1, len(course_codes)):
-                    log(f"Opening course {i+1}/{len(course_codes)}: {course_names[i]} ({course_codes[i]})")
-                    try:
-                        # Use JavaScript to open in a new tab, then wait for the popup
-                        with page1.expect_popup() as popup_info:
-                            page1.evaluate(f"window.open('{course_urls[i]}', '_blank')")
-                        new_page = popup_info.value
-                        pages.append(new_page)
-                        
-                        # Wait for the page to load
-                        new_page.wait_for_load_state("networkidle", timeout=30000)
-                        
-                        # Verify page loaded correctly
-                        status = get_status(new_page)
-                        if status:
-                            log(f"✓ Course {course_codes[i]} loaded. Status: {status}")
-                        else:
-                            log(f"WARNING: Could not verify course {course_codes[i]}. Continuing anyway...")
-                    except Exception as e:
-                        log(f"ERROR: Failed to open course {course_codes[i]}: {e}")
-                        # Create page manually as fallback
-                        new_page = context.new_page()
-                        new_page.goto(course_urls[i], wait_until="networkidle", timeout=30000)
-                        pages.append(new_page)
+            await load_session_cookies(context, client)
             
-            # Step 3: Get initial statuses
+            # Course pages only need their HTML from here on
+            await page.route("**/*", block_subresources)
+            shared = SharedPage(page, page.locator(STATUS_SELECTOR).first)
+            
+            # Step 2: Get initial statuses
             log("\n" + "=" * 60)
             log("Initial Status Check")
             log("=" * 60)
-            initial_statuses = {}
-            for i, (page, name) in enumerate(zip(pages, course_names)):
-                status = check_course_status(page, course_urls[i], name)
-                initial_statuses[name] = status
+            statuses = await check_all_courses(client, shared, jobs)
+            store.update((name, status) for (_, name), status in zip(jobs, statuses))
+            # Last successfully checked status of each course
+            previous_statuses = {name: status for (_, name), status in zip(jobs, statuses) if status}
             
-            # Step 4: Start monitoring loop
+            # Step 3: Start monitoring loop
             log("\n" + "=" * 60)
             log(f"Starting monitoring loop (checking every {CHECK_INTERVAL_MINUTES} minutes)")
             log("Press Ctrl+C to stop")
             log("=" * 60 + "\n")
             
+            # Ctrl+C / SIGTERM wake the loop immediately instead of after the interval
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(sig, stop.set)
+                except (NotImplementedError, RuntimeError, ValueError):
+                    pass  # Signal handlers are unavailable off the main thread
+            
+            # Checks run on a fixed schedule so the time spent checking doesn't add drift
+            next_deadline = time.monotonic()
             check_count = 0
-            while True:
+            while not stop.is_set():
                 check_count += 1
+                next_deadline += CHECK_INTERVAL_SECONDS
                 log(f"\n--- Check #{check_count} ---")
                 
-                for i, (page, name) in enumerate(zip(pages, course_names)):
-                    status = check_course_status(page, course_urls[i], name)
-                    
+                statuses = await check_all_courses(client, shared, jobs)
+                store.update((name, status) for (_, name), status in zip(jobs, statuses))
+                for (url, name), status in zip(jobs, statuses):
                     if status:
-                        initial_status = initial_statuses.get(name, "unknown")
+                        previous_status = previous_statuses.get(name)
+                        previous_statuses[name] = status
                         
-                        # Check if status changed from "closed"
-                        if initial_status == "closed" and status != "closed":
+                        # Check if the course just opened up
+                        if is_open(status) and not is_open(previous_status):
                             log("=" * 60)
                             log(f"🎉 ALERT: {name} STATUS CHANGED!")
-                            log(f"   Previous: {initial_status}")
+                            log(f"   Previous: {previous_status or 'unknown'}")
                             log(f"   Current:  {status}")
-                            log(f"   URL: {course_urls[i]}")
+                            log(f"   URL: {url}")
                             log("=" * 60)
                             
-                            # Update initial status so we don't alert again for same change
-                            initial_statuses[name] = status
-                            
                             # Play loud alarm and open registration page
-                            play_alarm(name, status, page)
+                            await play_alarm(name, status, page)
                 
-                log(f"\nNext check in {CHECK_INTERVAL_MINUTES} minutes...")
-                time.sleep(CHECK_INTERVAL_SECONDS)
+                # After a check that overran the interval, skip the missed slots
+                # rather than running them back to back
+                now = time.monotonic()
+                if next_deadline <= now:
+                    missed = int((now - next_deadline) // CHECK_INTERVAL_SECONDS) + 1
+                    next_deadline += missed * CHECK_INTERVAL_SECONDS
+                    log(f"\nCheck took longer than {CHECK_INTERVAL_MINUTES} minutes, skipping {missed} missed check(s)")
+                
+                log(f"\nNext check in {(next_deadline - now) / 60:.1f} minutes...")
+                try:
+                    await asyncio.wait_for(stop.wait(), max(0, next_deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    pass
+            
+            log("\n\nMonitoring stopped by user.")
         
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError):
             log("\n\nMonitoring stopped by user.")
         except Exception as e:
             log(f"\n\nERROR: {e}")
             import traceback
             traceback.print_exc()
         finally:
+            store.stop()
+            await client.aclose()
             if browser:
                 try:
                     log("\nClosing browser...")
-                    browser.close()
+                    await browser.close()
                 except Exception as e:
                     log(f"Error closing browser (may already be closed): {e}")
             log("Done.")
 
 
+def main():
+    """Prompt for courses on the command line and monitor them."""
+    semester, course_codes = get_course_codes()
+    if not semester or not course_codes:
+        return
+    
+    try:
+        asyncio.run(monitor_courses(semester, course_codes))
+    except KeyboardInterrupt:
+        pass
+
+
 if __name__ == "__main__":
-    monitor_courses()
+    main()
 
@@ -0,0 +1,8 @@
+"""
+WSGI entry point for the UT Registration Checker web interface
+
+Run with:
+    gunicorn -w 1 -k gthread --threads 4 -b 0.0.0.0:3000 wsgi:app
+"""
+
+from app import app